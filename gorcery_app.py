@@ -1,9 +1,20 @@
 # -*- coding: utf-8 -*-
 import streamlit as st
 import pandas as pd
+import numpy as np
 import os, io
-from datetime import datetime, date, time as dtime
-import uuid
+from datetime import date, time as dtime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+import secrets
+import time
+
+# Receipt generation runs off the script thread so the order confirmation
+# renders without waiting on it.
+_EXEC = ThreadPoolExecutor(max_workers=2)
+
+# Copy-on-Write keeps filtered views lightweight; nothing here mutates the
+# inventory frame in place.
+pd.set_option("mode.copy_on_write", True)
 
 # -----------------------
 # Paths & constants
@@ -14,6 +25,20 @@ DEFAULT_INVENTORY_PATH = os.path.join(DATA_DIR, "inventory.csv")
 
 REQUIRED_COLS = ["S.No", "Item Category", "Item Name", "Quantity available in stock", "Price"]
 
+CSV_DTYPES = {
+    "S.No": "int64",
+    "Item Category": "string",
+    "Item Name": "string",
+    "Quantity available in stock": "int64",
+    "Price": "float64",
+}
+
+try:
+    import pyarrow  # noqa: F401
+    CSV_ENGINE = "pyarrow"
+except ImportError:
+    CSV_ENGINE = "c"
+
 # -----------------------
 # Utilities
 # -----------------------
@@ -21,80 +46,209 @@ def normalize_inventory(df: pd.DataFrame) -> pd.DataFrame:
     missing = [c for c in REQUIRED_COLS if c not in df.columns]
     if missing:
         raise ValueError(f"Missing required columns: {missing}")
-    df["S.No"] = pd.to_numeric(df["S.No"], errors="coerce").astype("Int64")
-    df["Quantity available in stock"] = pd.to_numeric(
-        df["Quantity available in stock"], errors="coerce"
-    ).fillna(0).astype(int)
-    df["Price"] = pd.to_numeric(df["Price"], errors="coerce").fillna(0.0).astype(float)
+    # Only coerce columns the parser couldn't type (e.g. dirty cells forced
+    # the fallback read without dtype hints).
+    if not pd.api.types.is_integer_dtype(df["S.No"]):
+        sno = pd.to_numeric(df["S.No"], errors="coerce")
+        # Missing serials get unique synthetic ids so every row has an int key
+        sno = sno.fillna(pd.Series(range(10**9, 10**9 + len(df)), index=df.index))
+        df["S.No"] = sno.astype("int64")
+    if not pd.api.types.is_integer_dtype(df["Quantity available in stock"]):
+        # na_value folds the fillna into the array conversion: one pass, one buffer
+        qty = pd.to_numeric(df["Quantity available in stock"], errors="coerce")
+        df["Quantity available in stock"] = qty.to_numpy(
+            dtype=np.float64, na_value=0.0
+        ).astype(np.int64, copy=False)
+    if not pd.api.types.is_float_dtype(df["Price"]):
+        price = pd.to_numeric(df["Price"], errors="coerce")
+        df["Price"] = price.to_numpy(dtype=np.float64, na_value=0.0)
+    else:
+        # Blank cells parse cleanly as NaN under the typed read, so the
+        # fallback above never sees them; fill here unconditionally.
+        df["Price"] = df["Price"].fillna(0.0)
     df = df.dropna(subset=["Item Name"]).copy()
+    # Integer cents keep cart arithmetic exact and round()-free; na_value
+    # guards the int cast against any NaN that slips through upstream
+    cents = (df["Price"] * 100).round().to_numpy(dtype=np.float64, na_value=0.0)
+    df["PriceCents"] = cents.astype(np.int64, copy=False)
+    # Categorical codes make the per-rerun equality filters integer
+    # comparisons and shrink the frame in memory.
+    df["Item Category"] = df["Item Category"].astype("category")
+    df["Item Name"] = df["Item Name"].astype("category")
     return df
 
 def read_inventory_csv(path: str) -> pd.DataFrame:
-    df = pd.read_csv(path)
+    try:
+        # Typed single-pass parse (PyArrow engine when available).
+        df = pd.read_csv(path, engine=CSV_ENGINE, dtype=CSV_DTYPES)
+    except (ValueError, TypeError):
+        # Dirty cells: re-read untyped and let normalize_inventory coerce.
+        df = pd.read_csv(path)
     return normalize_inventory(df)
 
-def add_to_cart(item_row: pd.Series, qty: int):
-    key = int(item_row["S.No"]) if pd.notna(item_row["S.No"]) else hash(item_row["Item Name"])
+def _parquet_cache_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".parquet"
+
+def _read_parquet_cache(path: str, csv_mtime: float):
+    """Return the sidecar Parquet frame if its stored CSV mtime matches, else None."""
+    pq_path = _parquet_cache_path(path)
+    if CSV_ENGINE != "pyarrow" or not os.path.exists(pq_path):
+        return None
+    try:
+        import pyarrow.parquet as pq
+        meta = pq.read_schema(pq_path).metadata or {}
+        if float(meta.get(b"csv_mtime", b"-1")) != csv_mtime:
+            return None
+        df = pd.read_parquet(pq_path, engine="pyarrow")
+        # A sidecar written by an older app version may miss derived columns
+        if any(c not in df.columns for c in REQUIRED_COLS + ["PriceCents"]):
+            return None
+        return df
+    except Exception:
+        return None
+
+def _write_parquet_cache(df: pd.DataFrame, path: str, csv_mtime: float):
+    if CSV_ENGINE != "pyarrow":
+        return
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(df)
+        meta = dict(table.schema.metadata or {})
+        meta[b"csv_mtime"] = str(csv_mtime).encode()
+        pq.write_table(
+            table.replace_schema_metadata(meta),
+            _parquet_cache_path(path),
+            compression="zstd",
+        )
+    except Exception:
+        pass  # the sidecar is purely an optimization; CSV remains the source
+
+@st.cache_resource(show_spinner=False)
+def get_default_inventory(path: str, mtime: float) -> pd.DataFrame:
+    """Process-global inventory frame, shared read-only by every session.
+
+    cache_resource hands all sessions the same object instead of a
+    per-session copy; safe here because nothing mutates the frame in
+    place (enforced by Copy-on-Write). mtime is part of the cache key so
+    an edited CSV invalidates the cache.
+    """
+    df = _read_parquet_cache(path, mtime)
+    if df is None:
+        df = read_inventory_csv(path)
+        _write_parquet_cache(df, path, mtime)
+    return df
+
+def build_lookups(inv: pd.DataFrame):
+    """Precompute lookup structures so reruns avoid full-DataFrame scans."""
+    # .cat.categories is already lexically sorted and NaN-free
+    st.session_state.categories = list(inv["Item Category"].cat.categories)
+    # drop=False keeps "Item Name" inside each row dict
+    st.session_state.items_by_name = inv.set_index("Item Name", drop=False).to_dict("index")
+    stock = inv.set_index("Item Name")["Quantity available in stock"]
+    stock.index = stock.index.astype(str)  # plain index so reindex accepts any name
+    st.session_state.stock_series = stock
+    # category -> positional indexer, so switching category is a take(), not a scan
+    st.session_state.cat_indices = inv.groupby("Item Category", observed=True, sort=False).indices
+
+@st.cache_data(show_spinner=False)
+def _names_for(category: str, inv_version: float) -> list:
+    inv = st.session_state.inventory
+    if category != "All":
+        inv = inv.take(st.session_state.cat_indices[category])
+    return inv["Item Name"].tolist()
+
+def add_to_cart(item: dict, qty: int):
+    # normalize_inventory guarantees every row carries a unique int S.No
+    key = item["S.No"]
     cart = st.session_state.cart
     if key in cart:
         cart[key]["qty"] += qty
-        cart[key]["line_total"] = round(cart[key]["qty"] * cart[key]["unit_price"], 2)
+        cart[key]["line_total_cents"] = cart[key]["qty"] * cart[key]["unit_price_cents"]
     else:
         cart[key] = {
-            "S.No": int(item_row["S.No"]) if pd.notna(item_row["S.No"]) else None,
-            "Item Category": item_row["Item Category"],
-            "Item Name": item_row["Item Name"],
+            "S.No": key,
+            "Item Category": item["Item Category"],
+            "Item Name": item["Item Name"],
             "qty": qty,
-            "unit_price": float(item_row["Price"]),
-            "line_total": round(qty * float(item_row["Price"]), 2),
+            "unit_price_cents": int(item["PriceCents"]),
+            "line_total_cents": qty * int(item["PriceCents"]),
         }
 
+CART_COLS = ["Item Category", "Item Name", "Qty", "Unit Price", "Line Total"]
+
+def _cart_snapshot() -> tuple:
+    """One hashable snapshot of the cart, shared as the cache key below."""
+    return tuple(
+        (k, v["Item Category"], v["Item Name"], v["qty"], v["unit_price_cents"])
+        for k, v in sorted(st.session_state.cart.items())
+    )
+
+@st.cache_data(show_spinner=False)
+def _cart_df(snap: tuple) -> pd.DataFrame:
+    return pd.DataFrame.from_records(
+        ((cat, name, qty, cents / 100, qty * cents / 100)
+         for _, cat, name, qty, cents in snap),
+        columns=CART_COLS,
+    )
+
+@st.cache_data(show_spinner=False)
+def _cart_total_cents(snap: tuple) -> int:
+    return sum(qty * cents for _, _, _, qty, cents in snap)
+
 def cart_to_dataframe():
     if not st.session_state.cart:
-        return pd.DataFrame(columns=["Item Category", "Item Name", "Qty", "Unit Price", "Line Total"])
-    rows = []
-    for v in st.session_state.cart.values():
-        rows.append([v["Item Category"], v["Item Name"], v["qty"], v["unit_price"], v["line_total"]])
-    return pd.DataFrame(rows, columns=["Item Category", "Item Name", "Qty", "Unit Price", "Line Total"])
+        return pd.DataFrame(columns=CART_COLS)
+    return _cart_df(_cart_snapshot())
 
-def cart_total():
-    return round(sum(v["line_total"] for v in st.session_state.cart.values()), 2)
+def cart_total_cents() -> int:
+    return _cart_total_cents(_cart_snapshot())
 
 def reset_cart():
     st.session_state.cart = {}
 
+# Prebound formatters skip per-call format-spec parsing in the row loop
+_MONEY = "${:,.2f}".format
+_AMOUNT = "{:.2f}".format
+_TOTAL_FMT = "{:,.2f}".format
+
+# Receipt layout, assembled once at import rather than per call
+_RECEIPT_HEADER = ",".join(CART_COLS) + "\n"
+_RECEIPT_META = (
+    "Order ID,{}\n"
+    "Customer,{}\n"
+    "Phone,{}\n"
+    "Pickup,{} {}\n"
+    "Payment,In-store only\n"
+    "\n"
+)
+
 def make_itemized_csv(order_id: str, customer_name: str, phone: str,
                       pickup_date: date, pickup_time: dtime,
-                      items_df: pd.DataFrame, total: float) -> bytes:
+                      items: list, total: float) -> bytes:
     """
     Build an itemized CSV (as bytes) that includes order meta + full line items.
     """
     buf = io.StringIO()
-    # Order meta
-    buf.write("Order ID,{}\n".format(order_id))
-    buf.write("Customer,{}\n".format(customer_name))
-    buf.write("Phone,{}\n".format(phone))
-    buf.write("Pickup,{} {}\n".format(pickup_date, pickup_time.strftime("%H:%M")))
-    buf.write("Payment,In-store only\n")
-    buf.write("\n")  # blank line
-
-    # Line items header
-    cols = ["Item Category", "Item Name", "Qty", "Unit Price", "Line Total"]
-    buf.write(",".join(cols) + "\n")
-
-    # Line items rows
-    for _, r in items_df.iterrows():
+    # Order meta + line items header
+    buf.write(_RECEIPT_META.format(
+        order_id, customer_name, phone, pickup_date, pickup_time.strftime("%H:%M")
+    ))
+    buf.write(_RECEIPT_HEADER)
+
+    # Line items rows: (category, name, qty, unit_price, line_total) tuples
+    for cat, name, qty, unit_price, line_total in items:
         row = [
-            str(r["Item Category"]),
-            str(r["Item Name"]).replace(",", " "),  # avoid commas inside cell
-            str(int(r["Qty"])),
-            f"{float(r['Unit Price']):.2f}",
-            f"{float(r['Line Total']):.2f}",
+            str(cat),
+            str(name).replace(",", " "),  # avoid commas inside cell
+            str(qty),
+            _AMOUNT(unit_price),
+            _AMOUNT(line_total),
         ]
         buf.write(",".join(row) + "\n")
 
     # Total row
-    buf.write(",,,Total,{}\n".format(f"{total:,.2f}"))
+    buf.write(",,,Total,{}\n".format(_TOTAL_FMT(total)))
     return buf.getvalue().encode("utf-8")
 
 # -----------------------
@@ -109,7 +263,10 @@ if "inventory" not in st.session_state:
     # Always load from repo (no upload UI)
     if os.path.exists(DEFAULT_INVENTORY_PATH):
         try:
-            st.session_state.inventory = read_inventory_csv(DEFAULT_INVENTORY_PATH)
+            inv_mtime = os.path.getmtime(DEFAULT_INVENTORY_PATH)
+            st.session_state.inventory = get_default_inventory(DEFAULT_INVENTORY_PATH, inv_mtime)
+            st.session_state.inv_version = inv_mtime
+            build_lookups(st.session_state.inventory)
         except Exception as e:
             st.session_state.inventory = None
             st.error(f"Failed to read data/inventory.csv: {e}")
@@ -126,15 +283,15 @@ if st.session_state.inventory is None:
 # -----------------------
 # Catalog & Add to Cart
 # -----------------------
-inv = st.session_state.inventory.copy()
+inv = st.session_state.inventory
 left, right = st.columns([2, 1])
 
 with left:
     st.subheader("Browse Items")
-    categories = ["All"] + sorted(inv["Item Category"].dropna().unique().tolist())
+    categories = ["All"] + st.session_state.categories
     category = st.selectbox("Filter by category", categories, index=0)
     if category != "All":
-        inv = inv[inv["Item Category"] == category]
+        inv = inv.take(st.session_state.cat_indices[category])
 
     st.dataframe(
         inv[["S.No", "Item Category", "Item Name", "Quantity available in stock", "Price"]]
@@ -144,12 +301,12 @@ with left:
 
     with st.form("add_to_cart_form", clear_on_submit=True):
         st.markdown("### Add to cart")
-        item_names = inv["Item Name"].tolist()
+        item_names = _names_for(category, st.session_state.inv_version)
         if not item_names:
             st.info("No items available in this category.")
         else:
             chosen_name = st.selectbox("Item", item_names)
-            item_row = inv[inv["Item Name"] == chosen_name].iloc[0]
+            item_row = st.session_state.items_by_name[chosen_name]
             max_qty = int(item_row["Quantity available in stock"])
             qty = st.number_input("Quantity", min_value=1, max_value=max(max_qty, 1), value=1, step=1)
             submitted = st.form_submit_button("Add")
@@ -164,8 +321,7 @@ with right:
     st.subheader("Your Cart")
     cart_df = cart_to_dataframe()
     st.dataframe(cart_df, use_container_width=True, hide_index=True)
-    total = cart_total()
-    st.metric("Total", f"${total:,.2f}")
+    st.metric("Total", _MONEY(cart_total_cents() / 100))
     if st.button("Clear cart"):
         reset_cart()
         st.info("Cart cleared.")
@@ -197,29 +353,35 @@ with st.form("checkout_form", clear_on_submit=False):
         elif not customer_name or not phone or not agree:
             st.warning("Please fill your details and acknowledge the no-online-payment policy.")
         else:
-            # Validate against the uploaded (read-only) stock
-            ok = True
-            inv_now = st.session_state.inventory
-            for _, item in st.session_state.cart.items():
-                row = inv_now[inv_now["Item Name"] == item["Item Name"]]
-                if row.empty or int(row["Quantity available in stock"].iloc[0]) < item["qty"]:
-                    ok = False
-                    st.error(f"Not enough stock for {item['Item Name']} per your sheet. Please adjust quantity.")
-                    break
+            # Validate the whole cart against the (read-only) stock in one shot
+            want = pd.Series({v["Item Name"]: v["qty"] for v in st.session_state.cart.values()})
+            have = st.session_state.stock_series.reindex(want.index, fill_value=0)
+            # have shares want's index, so compare the raw arrays directly
+            bad = want.index[want.to_numpy() > have.to_numpy()]
+            ok = len(bad) == 0
+            for name in bad:
+                st.error(f"Not enough stock for {name} per your sheet. Please adjust quantity.")
             if ok:
-                oid = f"ORD-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{str(uuid.uuid4())[:8].upper()}"
-                items_df = cart_to_dataframe()
-                total_amt = cart_total()
+                ts = time.strftime("%Y%m%d-%H%M%S", time.localtime(time.time_ns() // 1_000_000_000))
+                oid = f"ORD-{ts}-{secrets.token_hex(4).upper()}"
+                total_amt = cart_total_cents() / 100
 
-                # Build itemized CSV and stash for download outside the form
+                # Build itemized CSV in the background; the download button
+                # outside the form picks it up once it resolves
                 st.session_state["last_order_id"] = oid
-                st.session_state["receipt_csv"] = make_itemized_csv(
+                st.session_state["receipt_csv"] = None
+                st.session_state["receipt_future"] = _EXEC.submit(
+                    make_itemized_csv,
                     order_id=oid,
                     customer_name=customer_name,
                     phone=phone,
                     pickup_date=p_date,
                     pickup_time=p_time,
-                    items_df=items_df,
+                    items=[
+                        (v["Item Category"], v["Item Name"], v["qty"],
+                         v["unit_price_cents"] / 100, v["line_total_cents"] / 100)
+                        for v in st.session_state.cart.values()
+                    ],
                     total=total_amt
                 )
 
@@ -228,6 +390,15 @@ with st.form("checkout_form", clear_on_submit=False):
 
 # Show the CSV download button OUTSIDE the form
 with confirm_area:
+    future = st.session_state.get("receipt_future")
+    if future is not None:
+        try:
+            # The build is sub-millisecond; wait briefly so the button shows
+            # on this run instead of after the next widget interaction.
+            st.session_state["receipt_csv"] = future.result(timeout=2)
+            st.session_state["receipt_future"] = None
+        except FuturesTimeout:
+            st.info("Preparing your receipt…")
     if st.session_state.get("receipt_csv"):
         st.download_button(
             "Download Receipt (CSV)",